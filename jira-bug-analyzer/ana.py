@@ -1,12 +1,13 @@
 """
 Bug 分析脚本 - 使用 LLM 分析 bugs_md 目录下的所有 Bug 文档
-生成 analyzer.md 汇总报告（流式处理）
+生成 analyzer.md 汇总报告（并发处理）
 """
 import argparse
+import asyncio
 import os
 import logging
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, TextIO
 
 from llm_analyzer import get_bug_analyzer_llm, LLMIntegrationError
 
@@ -19,63 +20,97 @@ logger = logging.getLogger(__name__)
 
 
 class BugAnalyzer:
-    """Bug 分析器 - 流式处理版本"""
+    """Bug 分析器 - 并发处理版本"""
     
-    def __init__(self, bugs_dir: str = "bugs_md", output_file: str = "analyzer.md"):
+    def __init__(self, bugs_dir: str = "bugs_md", output_file: str = "analyzer.md",
+                 max_concurrency: int = 16, batch_size: int = 8):
         """
         初始化分析器
         
         Args:
             bugs_dir: Bug markdown 文件所在目录
             output_file: 输出报告文件名
+            max_concurrency: 同时进行的 LLM 分析请求数上限
+            batch_size: 每次 LLM 请求分析的 bug 数量
         """
         self.bugs_dir = bugs_dir
         self.output_file = output_file
-        self.llm = get_bug_analyzer_llm()
+        self.max_concurrency = max_concurrency
+        self.batch_size = max(1, batch_size)
+        self.llm = None  # 确认有待分析文件后再初始化，避免无谓的配置校验和客户端创建
         self.bug_count = 0
         self.urgent_count = 0
         self.total_bugs = 0
+        self.total_batches = 0
     
-    def get_bug_files(self) -> list:
+    def get_bug_files(self) -> List[os.DirEntry]:
         """
         获取目录下的所有 bug markdown 文件列表
         
         Returns:
-            排序后的 bug 文件路径列表
+            按 inode 排序的 bug 文件目录项列表（读取顺序尽量贴近磁盘布局）
         """
-        bugs_path = Path(self.bugs_dir)
-        
-        if not bugs_path.exists():
+        if not os.path.isdir(self.bugs_dir):
             logger.error(f"Bug directory not found: {self.bugs_dir}")
             return []
         
-        # 获取所有 .md 文件
-        bug_files = sorted(bugs_path.glob("*.md"))
+        # 一次 scandir 获取所有 .md 文件，目录项自带 inode/stat 缓存
+        with os.scandir(self.bugs_dir) as entries:
+            bug_files = [e for e in entries if e.name.endswith(".md") and e.is_file()]
+        bug_files.sort(key=lambda e: e.inode())
         logger.info(f"Found {len(bug_files)} bug files")
         return bug_files
     
-    def write_report_header(self) -> None:
-        """写入报告头部"""
+    @staticmethod
+    def read_bug_file(entry: os.DirEntry) -> str:
+        """
+        以二进制读取 bug 文件并一次性解码
+        
+        Args:
+            entry: bug 文件目录项
+            
+        Returns:
+            文件内容（非法 UTF-8 字节以替换字符代替）
+        """
+        with open(entry.path, 'rb') as f:
+            data = f.read()
+        return data.decode('utf-8', errors='replace')
+    
+    def write_report_header(self, f: TextIO) -> None:
+        """
+        写入报告头部和统计摘要（需在所有分析完成、统计就绪后调用）
+        
+        Args:
+            f: 已打开的报告文件
+        """
         from datetime import datetime
         
+        non_urgent_count = self.bug_count - self.urgent_count
+        
         header = f"""# Bug 分析报告
 
 **生成时间:** {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
 
 ---
 
+## 统计摘要
+
+- **总 Bug 数:** {self.bug_count}
+- **需要紧急修复:** {self.urgent_count}
+- **可以延后处理:** {non_urgent_count}
+
+
 ## Bug 分析详情
 
 """
-        with open(self.output_file, 'w', encoding='utf-8') as f:
-            f.write(header)
-        logger.info(f"Report header written to {self.output_file}")
+        f.write(header)
     
-    def write_bug_analysis(self, result: Dict[str, Any]) -> None:
+    def write_bug_analysis(self, f: TextIO, result: Dict[str, Any]) -> None:
         """
-        将单个 bug 的分析结果写入输出文件
+        将单个 bug 的分析结果写入报告
         
         Args:
+            f: 已打开的报告文件
             result: 分析结果字典
         """
         bug_id = result.get("bug_id", "Unknown")
@@ -108,39 +143,93 @@ class BugAnalyzer:
 ---
 
 """
+        f.write(content)
+    
+    @staticmethod
+    def _failure_result(bug_id: str, summary: str, reason: str) -> Dict[str, Any]:
+        """构建分析失败时写入报告的占位结果"""
+        return {
+            "bug_id": bug_id,
+            "summary": summary,
+            "urgent": False,
+            "urgency_reason": reason,
+            "fix_suggestion": "请手动检查",
+            "has_content": False
+        }
+    
+    @staticmethod
+    def _on_summary(bug_id: str, summary: str) -> None:
+        """流式分析中 summary 生成完毕时的回调，提前输出进度"""
+        logger.info(f"Summary ready for {bug_id}: {summary[:80]}")
+    
+    async def _analyze_single(self, bug_id: str, content: str) -> Dict[str, Any]:
+        """
+        单独分析一个 bug，失败时返回占位结果
         
-        # 追加写入文件
-        with open(self.output_file, 'a', encoding='utf-8') as f:
-            f.write(content)
+        Args:
+            bug_id: Bug ID
+            content: bug 文档内容
+            
+        Returns:
+            分析结果字典
+        """
+        try:
+            return await self.llm.analyze_bug(bug_id, content, on_summary=self._on_summary)
+        except LLMIntegrationError as e:
+            logger.error(f"Failed to analyze {bug_id}: {e}")
+            return self._failure_result(bug_id, "分析失败", f"LLM 分析出错: {str(e)[:100]}")
+        except Exception as e:
+            logger.error(f"Unexpected error analyzing {bug_id}: {e}")
+            return self._failure_result(bug_id, "分析异常", f"未知错误: {str(e)[:100]}")
     
-    def write_report_summary(self) -> None:
-        """写入报告的统计摘要"""
-        non_urgent_count = self.bug_count - self.urgent_count
+    async def _analyze_batch(self, sem: asyncio.Semaphore, batch_no: int,
+                             bug_files: List[os.DirEntry]) -> List[Dict[str, Any]]:
+        """
+        在信号量限制下用一次 LLM 请求分析一组 bug 文件
         
-        summary = f"""## 统计摘要
-
-- **总 Bug 数:** {self.bug_count}
-- **需要紧急修复:** {self.urgent_count}
-- **可以延后处理:** {non_urgent_count}
-
-"""
+        批量响应中缺失的 bug、或整个批次请求失败时，逐个单独重试，
+        失败只影响对应的 bug。
         
-        # 在文件开头插入摘要（实际上追加到现有头部之后）
-        with open(self.output_file, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        # 在 "## Bug 分析详情" 之前插入摘要
-        insertion_point = content.find("## Bug 分析详情")
-        if insertion_point != -1:
-            new_content = content[:insertion_point] + summary + "\n" + content[insertion_point:]
-            with open(self.output_file, 'w', encoding='utf-8') as f:
-                f.write(new_content)
-            logger.info("Report summary written")
+        Args:
+            sem: 控制并发数的信号量
+            batch_no: 批次序号（用于日志）
+            bug_files: 本批次的 bug 文件目录项
+            
+        Returns:
+            与 bug_files 顺序一致的分析结果列表（失败时返回占位结果）
+        """
+        bug_ids = [Path(bug_file.name).stem for bug_file in bug_files]  # 文件名不带扩展名
+        async with sem:
+            logger.info(f"Processing batch {batch_no}/{self.total_batches}: {', '.join(bug_ids)}")
+            results: Dict[str, Dict[str, Any]] = {}
+            
+            # 读取 bug 文件
+            items = []
+            for bug_id, bug_file in zip(bug_ids, bug_files):
+                try:
+                    items.append((bug_id, self.read_bug_file(bug_file)))
+                except OSError as e:
+                    logger.error(f"Failed to read {bug_id}: {e}")
+                    results[bug_id] = self._failure_result(bug_id, "分析异常", f"未知错误: {str(e)[:100]}")
+            
+            # 批量分析（单个文件无需批量协议）
+            batch_results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+            if len(items) > 1:
+                try:
+                    batch_results = await self.llm.analyze_bugs_batch(items)
+                except LLMIntegrationError as e:
+                    logger.warning(f"Batch {batch_no} failed, analyzing bugs individually: {e}")
+            
+            # 批量未得到结果的 bug 单独分析
+            for (bug_id, content), result in zip(items, batch_results):
+                results[bug_id] = result if result is not None else await self._analyze_single(bug_id, content)
+            
+            logger.info(f"✅ Analyzed {', '.join(bug_ids)}")
+            return [results[bug_id] for bug_id in bug_ids]
     
-    def run(self) -> None:
+    async def _run_async(self) -> None:
         """
-        执行完整的分析流程
-        逐个分析 bug，每分析完一个就立即写入文件
+        并发分析所有 bug，按 bug ID 顺序写入结果
         """
         logger.info("Starting bug analysis...")
         
@@ -151,73 +240,53 @@ class BugAnalyzer:
             return
         
         self.total_bugs = len(bug_files)
+        self.llm = get_bug_analyzer_llm()
         
-        # 写入报告头部
-        self.write_report_header()
+        # 按 batch_size 分组，每组一次 LLM 请求
+        batches = [bug_files[i:i + self.batch_size] for i in range(0, len(bug_files), self.batch_size)]
+        self.total_batches = len(batches)
         
-        # 逐个分析 bug
-        for idx, bug_file in enumerate(bug_files, 1):
-            bug_id = bug_file.stem  # 文件名不带扩展名
-            logger.info(f"Processing {idx}/{self.total_bugs}: {bug_id}")
-            
-            try:
-                # 读取 bug 文件
-                with open(bug_file, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                
-                # 分析 bug
-                result = self.llm.analyze_bug(bug_id, content)
-                
-                # 更新统计
-                self.bug_count += 1
-                if result.get("urgent", False):
-                    self.urgent_count += 1
-                
-                # 立即写入结果
-                self.write_bug_analysis(result)
-                logger.info(f"✅ Analyzed and wrote {bug_id}")
-                
-            except LLMIntegrationError as e:
-                logger.error(f"Failed to analyze {bug_id}: {e}")
-                result = {
-                    "bug_id": bug_id,
-                    "summary": "分析失败",
-                    "urgent": False,
-                    "urgency_reason": f"LLM 分析出错: {str(e)[:100]}",
-                    "fix_suggestion": "请手动检查",
-                    "has_content": False
-                }
-                self.bug_count += 1
-                self.write_bug_analysis(result)
-                
-            except Exception as e:
-                logger.error(f"Unexpected error analyzing {bug_id}: {e}")
-                result = {
-                    "bug_id": bug_id,
-                    "summary": "分析异常",
-                    "urgent": False,
-                    "urgency_reason": f"未知错误: {str(e)[:100]}",
-                    "fix_suggestion": "请手动检查",
-                    "has_content": False
-                }
-                self.bug_count += 1
-                self.write_bug_analysis(result)
-        
-        # 写入最终统计摘要
-        self.write_report_summary()
+        # 并发分析各批次，信号量限制同时在途的请求数
+        sem = asyncio.Semaphore(self.max_concurrency)
+        tasks = [self._analyze_batch(sem, idx, batch) for idx, batch in enumerate(batches, 1)]
+        batch_results = await asyncio.gather(*tasks)
+        
+        # 文件按 inode 顺序读取，报告仍按 bug ID 排序
+        results = sorted((r for batch in batch_results for r in batch), key=lambda r: r["bug_id"])
+        
+        # 先在内存中完成统计，摘要即可直接写在详情之前
+        self.bug_count = len(results)
+        self.urgent_count = sum(1 for r in results if r.get("urgent", False))
+        
+        # 一次打开文件，按 头部（含摘要） → 详情 顺序写入
+        with open(self.output_file, 'w', encoding='utf-8', buffering=1 << 20) as f:
+            self.write_report_header(f)
+            for result in results:
+                self.write_bug_analysis(f, result)
+        logger.info(f"Report written to {self.output_file}")
         
         logger.info("Bug analysis completed")
         print(f"\n✅ 分析报告已生成: {self.output_file}")
         print(f"   总 Bug 数: {self.bug_count}")
         print(f"   需要紧急修复: {self.urgent_count}")
         print(f"   可以延后处理: {self.bug_count - self.urgent_count}")
+    
+    def run(self) -> None:
+        """
+        执行完整的分析流程
+        并发分析所有 bug，完成后按顺序写入报告
+        """
+        asyncio.run(self._run_async())
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Analyze bug markdown files with LLM")
     parser.add_argument("--bugs-dir", default="bugs_md", help="Directory containing bug markdown files")
     parser.add_argument("--output-file", default="analyzer.md", help="Output markdown report file")
+    parser.add_argument("--concurrency", type=int, default=16, help="Maximum number of concurrent LLM requests")
+    parser.add_argument("--batch-size", type=int, default=8, help="Number of bugs analyzed per LLM request")
     args = parser.parse_args()
 
-    analyzer = BugAnalyzer(bugs_dir=args.bugs_dir, output_file=args.output_file)
+    analyzer = BugAnalyzer(bugs_dir=args.bugs_dir, output_file=args.output_file,
+                           max_concurrency=args.concurrency, batch_size=args.batch_size)
     analyzer.run()
@@ -0,0 +1,93 @@
+"""
+Bug 分析结果缓存，避免对未修改的 Bug 文档重复调用 LLM
+"""
+import hashlib
+import logging
+import sqlite3
+import threading
+from typing import Dict, Any, Optional
+
+import orjson
+
+logger = logging.getLogger(__name__)
+
+
+class AnalysisCache:
+    """
+    基于 SQLite 的分析结果缓存
+    
+    以命名空间加 Bug 文档内容的 sha256 作为 key，文档内容不变则结果永不过期。
+    命名空间应包含影响分析结果的配置（部署、提示词/Schema 版本），配置变化后旧条目不再命中。
+    缓存打开或读写失败只记录警告，不影响正常分析流程；无法打开时缓存整体禁用。
+    """
+    
+    def __init__(self, db_path: str, namespace: str = ""):
+        """
+        初始化缓存
+        
+        Args:
+            db_path: SQLite 数据库文件路径
+            namespace: 参与 key 计算的命名空间
+        """
+        self.db_path = db_path
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        try:
+            conn = sqlite3.connect(db_path, check_same_thread=False)
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS analysis (key TEXT PRIMARY KEY, result TEXT NOT NULL)"
+            )
+            conn.commit()
+            self._conn = conn
+        except sqlite3.Error as e:
+            logger.warning(f"Analysis cache disabled, cannot open {db_path}: {e}")
+    
+    def make_key(self, bug_content: str) -> str:
+        """计算文档内容在当前命名空间下的缓存 key"""
+        digest = hashlib.sha256(self.namespace.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(bug_content.encode("utf-8"))
+        return digest.hexdigest()
+    
+    def get(self, bug_content: str) -> Optional[Dict[str, Any]]:
+        """
+        查询缓存的分析结果
+        
+        Args:
+            bug_content: Bug 文档的完整内容
+            
+        Returns:
+            缓存的分析结果字典，未命中或缓存不可用时返回 None
+        """
+        if self._conn is None:
+            return None
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT result FROM analysis WHERE key = ?", (self.make_key(bug_content),)
+                ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Analysis cache read failed: {e}")
+            return None
+        return orjson.loads(row[0]) if row else None
+    
+    def set(self, bug_content: str, result: Dict[str, Any]) -> None:
+        """
+        写入分析结果
+        
+        Args:
+            bug_content: Bug 文档的完整内容
+            result: 分析结果字典
+        """
+        if self._conn is None:
+            return
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO analysis (key, result) VALUES (?, ?)",
+                    (self.make_key(bug_content), orjson.dumps(result)),
+                )
+                self._conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Analysis cache write failed: {e}")
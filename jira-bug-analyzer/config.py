@@ -1,9 +1,10 @@
 """
 Application configuration settings
 """
+from functools import lru_cache
 from pathlib import Path
 from pydantic_settings import BaseSettings
-from typing import List, Literal
+from typing import List, Literal, Optional
 
 
 class Settings(BaseSettings):
@@ -24,16 +25,35 @@ class Settings(BaseSettings):
     AZURE_OPENAI_DEPLOYMENT_NAME: str
     AZURE_OPENAI_API_VERSION: str
     
+    # Bug 分析使用的部署（如指向 gpt-4o-mini 的部署，延迟和成本更低）；未设置时使用 AZURE_OPENAI_DEPLOYMENT_NAME
+    ANALYZER_DEPLOYMENT_NAME: Optional[str] = None
+    
     # 模型配置
     MODEL_TEMPERATURE: float = 0.7
     
     # LLM生成阈值配置
     LLM_RETRY_TIMES: int = 3
     LLM_TIMEOUT_SECONDS: int = 60
+    LLM_MAX_CONNECTIONS: int = 64
+    
+    # 提示词前缀缓存 key（修改系统提示词、输出 Schema 或内容压缩规则时应同步更新版本号，
+    # 该值同时参与分析结果缓存的 key）
+    LLM_PROMPT_CACHE_KEY: str = "bug-analyzer-v3"
+    
+    # 分析结果缓存（SQLite 文件，按文档内容哈希命中）
+    ANALYSIS_CACHE_PATH: str = str(Path(__file__).resolve().parent / ".analysis_cache.db")
+    
+    @property
+    def analyzer_deployment(self) -> str:
+        """Bug 分析实际使用的 Azure 部署名"""
+        return self.ANALYZER_DEPLOYMENT_NAME or self.AZURE_OPENAI_DEPLOYMENT_NAME
     
     class Config:
         env_file = str(Path(__file__).resolve().parent / ".env")
         env_file_encoding = "utf-8"
 
 
-settings = Settings()
+@lru_cache()
+def get_settings() -> Settings:
+    """Return the application settings, loading and validating them on first use"""
+    return Settings()
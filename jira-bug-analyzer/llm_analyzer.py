@@ -1,23 +1,171 @@
 """
 LLM 集成服务，用于分析 Bug 文档
 """
-import json
+import re
 import time
 import logging
-from typing import Dict, Any, Tuple
+import urllib.parse
+from functools import lru_cache
+from typing import Callable, Dict, Any, List, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
+import httpx
+import orjson
 from langchain_openai import AzureChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import JsonOutputParser
 from langchain_core.exceptions import LangChainException
+from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_core.utils.json import parse_partial_json
+from pydantic import BaseModel, ValidationError
 
 try:
-    from config import settings
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+try:
+    from config import get_settings
+    from analysis_cache import AnalysisCache
 except ImportError:
     # 当作为模块导入时
-    from .config import settings
+    from .config import get_settings
+    from .analysis_cache import AnalysisCache
+
+
+# 每个 Bug 文档压缩后发送给 LLM 的最大字符数
+MAX_CONTENT_CHARS = 4096
+# 每段堆栈保留的最大帧数
+MAX_STACK_FRAMES = 20
+
+_BASE64_RE = re.compile(r"(?:data:[\w/+.-]+;base64,)?[A-Za-z0-9+/]{200,}={0,2}")
+_STACK_FRAME_RE = re.compile(r"^\s*(?:at \S|File \".*\", line \d+)")
+_BLANK_LINES_RE = re.compile(r"\n\s*\n(?:\s*\n)+")
+
+# 有效字符（字母、数字、汉字）少于该值的文档视为内容过少，不调用 LLM
+MIN_MEANINGFUL_CHARS = 40
+# main.py 生成的文档中，描述部分有效字符少于该值视为没有实际描述
+MIN_DESCRIPTION_CHARS = 20
+
+_NON_WORD_RE = re.compile(r"\W+")
+# main.render_bug_md 生成的文档骨架
+_BUG_MD_SKELETON_RE = re.compile(
+    r"\A# [^\n]*\n\n\*\*Status:\*\* [^\n]*\n\n\*\*Assignee:\*\* [^\n]*\n\n"
+    r"\*\*Description:\*\*\n(?P<description>.*)\Z",
+    re.DOTALL,
+)
+
+# 系统提示词保持为固定常量：提供商按前缀字节缓存，任何改动都会让缓存失效
+SYSTEM_PROMPT = """你是一个专业的 Bug 分析专家。请分析提供的 Bug 文档，并按以下要求提供分析结果：
+
+1. 概述（summary）：用 3-5 句话总结这个 Bug 的核心问题、影响范围和严重程度
+2. 紧急性评估（urgent）：判断是否需要尽快修改，这个 Bug 的优先级是否很高
+3. 紧急原因（urgency_reason）：用 1-2 句话说明为什么需要或不需要尽快修改，考虑影响的用户数、安全风险等
+4. 修复建议（fix_suggestion）：用 1-2 句话提出如何修复这个 Bug 的建议方案
+
+如果文档内容不足以进行分析，请标记为无内容。
+
+请只返回有效的 JSON 格式（不需要代码块标记），包含以下字段：
+- summary (字符串)
+- urgent (布尔值: true 或 false)
+- urgency_reason (字符串)
+- fix_suggestion (字符串)
+- has_content (布尔值: true 或 false)"""
+
+USER_PROMPT_TEMPLATE = """请分析以下 Bug 文档：
+
+Bug ID: {bug_id}
+
+文档内容：
+{content}
+
+请只返回 JSON 格式，不需要其他说明。"""
+
+BATCH_SYSTEM_PROMPT = """你是一个专业的 Bug 分析专家。你将收到一个 JSON 数组，每个元素包含 bug_id 和 content（Bug 文档内容）。请逐个分析每个 Bug，并按以下要求提供分析结果：
+
+1. 概述（summary）：用 3-5 句话总结这个 Bug 的核心问题、影响范围和严重程度
+2. 紧急性评估（urgent）：判断是否需要尽快修改，这个 Bug 的优先级是否很高
+3. 紧急原因（urgency_reason）：用 1-2 句话说明为什么需要或不需要尽快修改，考虑影响的用户数、安全风险等
+4. 修复建议（fix_suggestion）：用 1-2 句话提出如何修复这个 Bug 的建议方案
+
+如果某个文档内容不足以进行分析，请将其标记为无内容。
+
+请返回一个 JSON 对象，其 items 字段为分析结果数组，顺序与输入一致，每个元素包含以下字段：
+- bug_id (字符串，与输入相同)
+- summary (字符串)
+- urgent (布尔值: true 或 false)
+- urgency_reason (字符串)
+- fix_suggestion (字符串)
+- has_content (布尔值: true 或 false)"""
+
+
+def _compress(content: str) -> str:
+    """
+    发送给 LLM 前确定性地压缩 Bug 文档，减少 token 数
+    
+    Jira v2 返回的描述是 wiki markup，其中的 HTML 都是报告者写的内容（如 {code:html} 示例），
+    因此不做 HTML 清理。去除 base64 数据，每段堆栈只保留前 MAX_STACK_FRAMES 帧，
+    合并连续重复行和多余空行，最后截断到 MAX_CONTENT_CHARS 个字符。
+    """
+    content = _BASE64_RE.sub("[base64 omitted]", content)
+    
+    lines = []
+    frames = 0
+    skipped = 0
+    for line in content.splitlines():
+        if _STACK_FRAME_RE.match(line):
+            frames += 1
+            if frames > MAX_STACK_FRAMES:
+                skipped += 1
+                continue
+        else:
+            if skipped:
+                lines.append(f"\t... {skipped} more frames")
+            frames = skipped = 0
+        if lines and line.strip() and line == lines[-1]:
+            continue
+        lines.append(line)
+    if skipped:
+        lines.append(f"\t... {skipped} more frames")
+    
+    content = _BLANK_LINES_RE.sub("\n\n", "\n".join(lines)).strip()
+    if len(content) > MAX_CONTENT_CHARS:
+        content = content[:MAX_CONTENT_CHARS] + "…"
+    return content
+
+
+def _is_trivial(bug_content: str) -> bool:
+    """
+    判断文档是否只有标题等骨架内容，无需调用 LLM 即可判定为内容过少
+    """
+    match = _BUG_MD_SKELETON_RE.match(bug_content)
+    if match:
+        description = match.group("description").strip()
+        if description in ("None", "No description"):
+            return True
+        return len(_NON_WORD_RE.sub("", description)) < MIN_DESCRIPTION_CHARS
+    return len(_NON_WORD_RE.sub("", bug_content)) < MIN_MEANINGFUL_CHARS
+
+
+@lru_cache(maxsize=1)
+def _get_encoding():
+    """获取用于统计 token 数的编码器，部署名无法映射到模型时使用通用编码"""
+    try:
+        return tiktoken.encoding_for_model(get_settings().analyzer_deployment)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+
+def _log_compression(bug_id: str, original: str, compressed: str) -> None:
+    """在 DEBUG 级别记录压缩前后的 token 数"""
+    if tiktoken is None or not logger.isEnabledFor(logging.DEBUG):
+        return
+    encoding = _get_encoding()
+    logger.debug(
+        f"Compressed {bug_id}: {len(encoding.encode(original))} -> "
+        f"{len(encoding.encode(compressed))} tokens"
+    )
 
 
 class LLMIntegrationError(Exception):
@@ -25,6 +173,35 @@ class LLMIntegrationError(Exception):
     pass
 
 
+class AnalysisSchema(BaseModel):
+    """单个 Bug 的结构化分析结果（由服务端 JSON Schema 约束输出）"""
+    summary: str
+    urgent: bool
+    urgency_reason: str
+    fix_suggestion: str
+    has_content: bool
+
+
+class AnalysisItem(AnalysisSchema):
+    """批量分析中单个 Bug 的分析结果"""
+    bug_id: str
+
+
+class AnalysisBatch(BaseModel):
+    """批量分析的结构化输出（JSON Schema 要求顶层为对象）"""
+    items: List[AnalysisItem]
+
+
+def _json_schema_format(model: type) -> Dict[str, Any]:
+    """构建 strict 模式的 json_schema response_format（strict 要求禁止额外字段）"""
+    schema = model.model_json_schema()
+    schema["additionalProperties"] = False
+    return {
+        "type": "json_schema",
+        "json_schema": {"name": model.__name__, "schema": schema, "strict": True},
+    }
+
+
 class BugAnalyzerLLM:
     """
     Bug 分析 LLM 服务
@@ -38,39 +215,115 @@ class BugAnalyzerLLM:
     def __init__(self):
         """初始化 LLM 服务"""
         self._llm = None
+        self._streaming = None
+        self._batch_structured = None
+        # 复用同一个 SystemMessage 对象，保证每次请求的提示词前缀完全一致
+        self._system_msg = SystemMessage(content=SYSTEM_PROMPT)
+        self._batch_system_msg = SystemMessage(content=BATCH_SYSTEM_PROMPT)
+        settings = get_settings()
+        # 部署或提示词/Schema 版本变化时，同一文档的分析结果不再复用
+        self._cache = AnalysisCache(
+            settings.ANALYSIS_CACHE_PATH,
+            namespace=f"{settings.analyzer_deployment}:{settings.LLM_PROMPT_CACHE_KEY}",
+        )
         self._initialize_llm()
     
     def _initialize_llm(self) -> None:
         """初始化 LLM 客户端"""
+        settings = get_settings()
         try:
-            logger.info("Initializing Azure OpenAI LLM client for Bug Analysis")
+            logger.info(f"Initializing Azure OpenAI LLM client for Bug Analysis ({settings.analyzer_deployment})")
             
             # 解析 endpoint 以获取基础 URL
-            import urllib.parse
             parsed_url = urllib.parse.urlparse(settings.AZURE_OPENAI_ENDPOINT)
             base_url = f"{parsed_url.scheme}://{parsed_url.netloc}"
             
+            # 复用 HTTP/2 连接池；池容量需大于并发请求数，否则请求会在连接上排队
+            limits = httpx.Limits(
+                max_connections=settings.LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.LLM_MAX_CONNECTIONS,
+            )
+            
             self._llm = AzureChatOpenAI(
                 azure_endpoint=base_url,
                 api_key=settings.AZURE_OPENAI_API_KEY,
                 api_version=settings.AZURE_OPENAI_API_VERSION,
-                azure_deployment=settings.AZURE_OPENAI_DEPLOYMENT_NAME,
+                azure_deployment=settings.analyzer_deployment,
                 temperature=settings.MODEL_TEMPERATURE,
                 timeout=settings.LLM_TIMEOUT_SECONDS,
                 max_retries=settings.LLM_RETRY_TIMES,
+                # 固定的缓存 key 让请求路由到已缓存系统提示词前缀的节点
+                extra_body={"prompt_cache_key": settings.LLM_PROMPT_CACHE_KEY},
+                http_client=httpx.Client(
+                    http2=True, limits=limits, timeout=settings.LLM_TIMEOUT_SECONDS
+                ),
+                http_async_client=httpx.AsyncClient(
+                    http2=True, limits=limits, timeout=settings.LLM_TIMEOUT_SECONDS
+                ),
             )
+            # 使用 JSON Schema 约束输出，由服务端保证返回合法 JSON。
+            # 单个分析直接绑定 response_format 以便逐块流式解析（with_structured_output 只在结束后解析一次）
+            self._streaming = self._llm.bind(response_format=_json_schema_format(AnalysisSchema))
+            self._batch_structured = self._llm.with_structured_output(AnalysisBatch, method="json_schema")
             logger.info("LLM client initialized successfully")
         except Exception as e:
             logger.error(f"Failed to initialize LLM client: {e}")
             raise LLMIntegrationError(f"LLM client initialization failed: {e}")
     
-    def analyze_bug(self, bug_id: str, bug_content: str) -> Dict[str, Any]:
+    @staticmethod
+    def _empty_result(bug_id: str) -> Dict[str, Any]:
+        """空文档的默认分析结果"""
+        return {
+            "bug_id": bug_id,
+            "summary": "无内容",
+            "urgent": False,
+            "urgency_reason": "文档为空或无有效内容",
+            "fix_suggestion": "无",
+            "has_content": False
+        }
+    
+    @staticmethod
+    def _sparse_result(bug_id: str) -> Dict[str, Any]:
+        """内容过少（仅有标题或极短描述）文档的默认分析结果"""
+        return {
+            "bug_id": bug_id,
+            "summary": "内容过少",
+            "urgent": False,
+            "urgency_reason": "文档缺少有效描述，无法评估影响范围",
+            "fix_suggestion": "补充问题现象、复现步骤和影响范围后再分析",
+            "has_content": False
+        }
+    
+    @staticmethod
+    def _completed_summary(response_text: str) -> Optional[str]:
+        """
+        从流式输出的部分 JSON 中提取已完整生成的 summary
+        
+        summary 之后出现其他字段即视为 summary 已生成完毕。
+        
+        Returns:
+            完整的 summary 文本，尚未完成时返回 None
+        """
+        try:
+            partial = parse_partial_json(response_text)
+        except ValueError:
+            return None
+        if not isinstance(partial, dict) or "summary" not in partial:
+            return None
+        if list(partial)[-1] == "summary":
+            return None
+        return partial["summary"]
+    
+    async def analyze_bug(self, bug_id: str, bug_content: str,
+                          on_summary: Optional[Callable[[str, str], None]] = None) -> Dict[str, Any]:
         """
-        分析单个 Bug 文档
+        分析单个 Bug 文档（流式接收 LLM 输出）
         
         Args:
             bug_id: Bug ID（如 MP-288）
             bug_content: Bug 文档的完整内容
+            on_summary: 可选回调，summary 字段生成完毕后立即以 (bug_id, summary) 调用，
+                不必等待整个响应结束
             
         Returns:
             分析结果字典，包含：
@@ -88,78 +341,57 @@ class BugAnalyzerLLM:
             # 检查内容是否为空或无意义
             if not bug_content or not bug_content.strip():
                 logger.warning(f"Bug {bug_id} has no content")
-                return {
-                    "bug_id": bug_id,
-                    "summary": "无内容",
-                    "urgent": False,
-                    "urgency_reason": "文档为空或无有效内容",
-                    "fix_suggestion": "无",
-                    "has_content": False
-                }
+                return self._empty_result(bug_id)
             
-            # 构建分析提示词 - 直接调用 LLM，避免 ChatPromptTemplate 的花括号解析问题
-            from langchain_core.messages import HumanMessage, SystemMessage
+            # 只有骨架或极短描述的文档本地判定，不调用 LLM
+            if _is_trivial(bug_content):
+                logger.info(f"Bug {bug_id} has too little content, skipping LLM")
+                return self._sparse_result(bug_id)
             
-            system_prompt = """你是一个专业的 Bug 分析专家。请分析提供的 Bug 文档，并按以下要求提供分析结果：
-
-1. 概述（summary）：用 3-5 句话总结这个 Bug 的核心问题、影响范围和严重程度
-2. 紧急性评估（urgent）：判断是否需要尽快修改，这个 Bug 的优先级是否很高
-3. 紧急原因（urgency_reason）：用 1-2 句话说明为什么需要或不需要尽快修改，考虑影响的用户数、安全风险等
-4. 修复建议（fix_suggestion）：用 1-2 句话提出如何修复这个 Bug 的建议方案
-
-如果文档内容不足以进行分析，请标记为无内容。
-
-请只返回有效的 JSON 格式（不需要代码块标记），包含以下字段：
-- summary (字符串)
-- urgent (布尔值: true 或 false)
-- urgency_reason (字符串)
-- fix_suggestion (字符串)
-- has_content (布尔值: true 或 false)"""
+            # 文档内容未变化时直接返回缓存结果
+            cached = self._cache.get(bug_content)
+            if cached is not None:
+                logger.info(f"Cache hit for {bug_id}")
+                return {**cached, "bug_id": bug_id}
             
-            user_prompt = f"""请分析以下 Bug 文档：
-
-Bug ID: {bug_id}
-
-文档内容：
-{bug_content}
-
-请只返回 JSON 格式，不需要其他说明。"""
+            # 构建分析提示词 - 直接调用 LLM，避免 ChatPromptTemplate 的花括号解析问题
+            compressed = _compress(bug_content)
+            _log_compression(bug_id, bug_content, compressed)
+            user_prompt = USER_PROMPT_TEMPLATE.format(bug_id=bug_id, content=compressed)
             
             # 调用 LLM
             start_time = time.time()
             
             messages = [
-                SystemMessage(content=system_prompt),
+                self._system_msg,
                 HumanMessage(content=user_prompt)
             ]
             
-            response = self._llm.invoke(messages)
+            # 流式接收 JSON 文本，边接收边解析，summary 一旦完整即通知调用方
+            chunks = []
+            summary_sent = on_summary is None
+            async for chunk in self._streaming.astream(messages):
+                chunks.append(chunk.content)
+                if not summary_sent:
+                    summary = self._completed_summary("".join(chunks))
+                    if summary is not None:
+                        on_summary(bug_id, summary)
+                        summary_sent = True
             elapsed_time = time.time() - start_time
             
-            # 提取 JSON 内容
-            response_text = response.content
+            response_text = "".join(chunks)
             logger.debug(f"LLM response for {bug_id}: {response_text[:200]}...")
-            
-            # 尝试从响应中提取 JSON
             try:
-                # 如果响应包含 markdown 代码块，提取其中的 JSON
-                if "```json" in response_text:
-                    json_str = response_text.split("```json")[1].split("```")[0].strip()
-                elif "```" in response_text:
-                    json_str = response_text.split("```")[1].split("```")[0].strip()
-                else:
-                    json_str = response_text.strip()
-                
-                result = json.loads(json_str)
-            except json.JSONDecodeError as e:
-                logger.error(f"Failed to parse JSON for {bug_id}: {response_text[:200]}")
-                raise LLMIntegrationError(f"Invalid JSON response: {str(e)}")
+                analysis = AnalysisSchema.model_validate_json(response_text)
+            except ValidationError as e:
+                logger.error(f"Invalid structured response for {bug_id}: {response_text[:200]}")
+                raise LLMIntegrationError(f"Invalid structured response: {str(e)}")
             
             logger.info(f"Bug analysis completed for {bug_id} in {elapsed_time:.2f}s")
             
             # 添加 bug_id 到结果
-            result["bug_id"] = bug_id
-            result.setdefault("has_content", True)
+            result = analysis.model_dump() | {"bug_id": bug_id}
+            self._cache.set(bug_content, result)
             
             return result
             
@@ -168,6 +400,85 @@ Bug ID: {bug_id}
         except Exception as e:
             logger.error(f"Unexpected error analyzing {bug_id}: {e}")
             raise LLMIntegrationError(f"Analysis failed: {str(e)}")
+    
+    async def analyze_bugs_batch(self, items: List[Tuple[str, str]]) -> List[Optional[Dict[str, Any]]]:
+        """
+        在一次 LLM 请求中分析多个 Bug 文档
+        
+        Args:
+            items: (bug_id, bug_content) 列表
+            
+        Returns:
+            与 items 顺序一致的分析结果列表，字段同 analyze_bug；
+            LLM 响应中缺失或 bug_id 无法对应的 Bug 位置为 None，由调用方单独重试
+            
+        Raises:
+            LLMIntegrationError: 整个批次请求失败或响应无法解析
+        """
+        bug_ids = [bug_id for bug_id, _ in items]
+        try:
+            # 空文档、内容过少和命中缓存的文档不发送给 LLM
+            results: Dict[str, Dict[str, Any]] = {}
+            contents = dict(items)
+            pending = []
+            for bug_id, bug_content in items:
+                if not bug_content or not bug_content.strip():
+                    logger.warning(f"Bug {bug_id} has no content")
+                    results[bug_id] = self._empty_result(bug_id)
+                elif _is_trivial(bug_content):
+                    logger.info(f"Bug {bug_id} has too little content, skipping LLM")
+                    results[bug_id] = self._sparse_result(bug_id)
+                elif (cached := self._cache.get(bug_content)) is not None:
+                    logger.info(f"Cache hit for {bug_id}")
+                    results[bug_id] = {**cached, "bug_id": bug_id}
+                else:
+                    compressed = _compress(bug_content)
+                    _log_compression(bug_id, bug_content, compressed)
+                    pending.append({"bug_id": bug_id, "content": compressed})
+            
+            if pending:
+                user_prompt = orjson.dumps(pending).decode("utf-8")
+                
+                start_time = time.time()
+                messages = [
+                    self._batch_system_msg,
+                    HumanMessage(content=user_prompt)
+                ]
+                response = await self._batch_structured.ainvoke(messages)
+                elapsed_time = time.time() - start_time
+                
+                try:
+                    analyses = AnalysisBatch.model_validate(response).items
+                except ValidationError as e:
+                    logger.error(f"Invalid structured batch response for {bug_ids}: {response!r:.200}")
+                    raise LLMIntegrationError(f"Invalid structured response: {str(e)}")
+                
+                # 只接受 bug_id 与输入一致的结果；被改写的 bug_id 无法可靠对应，留给调用方单独重试
+                pending_ids = {item["bug_id"] for item in pending}
+                unknown = [a.bug_id for a in analyses if a.bug_id not in pending_ids]
+                if unknown:
+                    logger.warning(f"Batch response contains unknown bug_ids: {', '.join(unknown)}")
+                
+                for analysis in analyses:
+                    bug_id = analysis.bug_id
+                    if bug_id not in pending_ids or bug_id in results:
+                        continue
+                    results[bug_id] = analysis.model_dump()
+                    self._cache.set(contents[bug_id], results[bug_id])
+                
+                logger.info(f"Batch analysis of {len(pending)} bugs completed in {elapsed_time:.2f}s")
+            
+            missing = [bug_id for bug_id in bug_ids if bug_id not in results]
+            if missing:
+                logger.warning(f"Batch response missing bugs: {', '.join(missing)}")
+            
+            return [results.get(bug_id) for bug_id in bug_ids]
+            
+        except LLMIntegrationError:
+            raise
+        except Exception as e:
+            logger.error(f"Unexpected error analyzing batch {bug_ids}: {e}")
+            raise LLMIntegrationError(f"Batch analysis failed: {str(e)}")
 
 
 # 全局实例
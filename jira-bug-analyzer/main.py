@@ -1,17 +1,34 @@
 import argparse
 import os
-from typing import List
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Tuple
 
 import requests
-import pandas as pd
+from requests.adapters import HTTPAdapter
 
 try:
-    from config import settings
+    from config import get_settings
 except ImportError:
-    from .config import settings
+    from .config import get_settings
 
-def fetch_bug_data(url, auth):
-    response = requests.get(url, auth=auth)
+# Number of issue keys per JQL search; Jira returns at most 100 issues per page
+SEARCH_BATCH_SIZE = 100
+SEARCH_FIELDS = "summary,status,assignee,description"
+# Print write progress once per this many files instead of once per file
+PROGRESS_INTERVAL = 50
+
+
+def create_session(pool_size: int = 32) -> requests.Session:
+    """Create a session whose connection pool is shared by all worker threads."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+def fetch_bug_data(session, url, auth, params=None):
+    response = session.get(url, auth=auth, params=params)
     if response.status_code == 200:
         return response.json()
     else:
@@ -19,15 +36,52 @@ def fetch_bug_data(url, auth):
         print(f"Response body: {response.text}")
         raise Exception(f"Failed to fetch data from {url}: {response.status_code}")
 
+def fetch_bugs_batch(session, base_url: str, issue_keys: List[str], auth) -> List[dict]:
+    """Fetch a batch of issues via the Jira enhanced search endpoint, following nextPageToken."""
+    api_url = f"{base_url}/rest/api/2/search/jql"
+    params = {
+        'jql': f"key in ({','.join(issue_keys)})",
+        'fields': SEARCH_FIELDS,
+        'maxResults': len(issue_keys),
+    }
+    issues = []
+    while True:
+        data = fetch_bug_data(session, api_url, auth, params)
+        issues.extend(data.get('issues', []))
+        next_page_token = data.get('nextPageToken')
+        # The server may cap maxResults below the batch size; keep paging until the last page
+        if not next_page_token or data.get('isLast', False):
+            return issues
+        params = {**params, 'nextPageToken': next_page_token}
+
+def fetch_issues(session, base_url: str, issue_keys: List[str], auth) -> List[dict]:
+    """Fetch a batch of issues, falling back to one request per issue if the search fails.
+
+    JQL rejects the whole query when any key does not exist, so a failed search is
+    retried per issue to keep the valid keys. Keys that still fail are left out and
+    reported once by the caller.
+    """
+    try:
+        return fetch_bugs_batch(session, base_url, issue_keys, auth)
+    except Exception as e:
+        print(f"Search failed for {len(issue_keys)} issues ({e}); fetching them individually")
+    issues = []
+    for issue_key in issue_keys:
+        try:
+            issues.append(fetch_bug_data(session, f"{base_url}/rest/api/2/issue/{issue_key}", auth))
+        except Exception:
+            continue
+    return issues
+
 def analyze_bugs(bug_data):
     # Example analysis: Count the number of bugs by status
-    status_counts = {}
-    for bug in bug_data:
-        status = bug.get('fields', {}).get('status', {}).get('name', 'Unknown')
-        status_counts[status] = status_counts.get(status, 0) + 1
-    return status_counts
+    # Missing, None and empty status names all count as 'Unknown'; keys keep first-seen order
+    return dict(Counter(
+        ((bug.get('fields') or {}).get('status') or {}).get('name') or 'Unknown' for bug in bug_data
+    ))
 
-def write_bug_to_md(bug, output_dir):
+def render_bug_md(bug, output_dir) -> Tuple[str, str]:
+    """Build the markdown for one bug; returns (filepath, content) without touching disk."""
     bug_id = bug.get('key', 'Unknown')
     fields = bug.get('fields', {})
     title = fields.get('summary', 'No title')
@@ -37,13 +91,29 @@ def write_bug_to_md(bug, output_dir):
     assignee = fields.get('assignee', {})
     assignee_name = assignee.get('displayName', 'Unassigned') if assignee else 'Unassigned'
     
-    md_content = f"# {bug_id}: {title}\n\n**Status:** {status_name}\n\n**Assignee:** {assignee_name}\n\n**Description:**\n{description}\n"
+    parts = [
+        "# ", str(bug_id), ": ", str(title),
+        "\n\n**Status:** ", str(status_name),
+        "\n\n**Assignee:** ", str(assignee_name),
+        "\n\n**Description:**\n", str(description), "\n",
+    ]
+    md_content = "".join(parts)
     
-    filename = f"{bug_id}.md"
-    filepath = os.path.join(output_dir, filename)
+    filepath = os.path.join(output_dir, f"{bug_id}.md")
+    return filepath, md_content
+
+def _write_file(filepath: str, content: str) -> str:
     with open(filepath, 'w') as f:
-        f.write(md_content)
-    print(f"Written {filename}")
+        f.write(content)
+    return filepath
+
+def write_md_files(files: List[Tuple[str, str]], max_workers: int = 16) -> None:
+    """Write all rendered markdown files in one batch, overlapping the per-file syscalls."""
+    total = len(files)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for written, _ in enumerate(executor.map(lambda item: _write_file(*item), files), 1):
+            if written % PROGRESS_INTERVAL == 0 or written == total:
+                print(f"Written {written}/{total} files")
 
 def load_issue_keys(file_path: str) -> List[str]:
     """Load issue keys from a text file, one per line."""
@@ -57,23 +127,42 @@ def load_issue_keys(file_path: str) -> List[str]:
     return issue_keys
 
 
-def main(issue_keys: List[str], output_dir: str):
+def main(issue_keys: List[str], output_dir: str, max_workers: int = 16):
     # Configure authentication from .env
+    settings = get_settings()
     email = settings.JIRA_EMAIL
     token = settings.JIRA_TOKEN
     auth = (email, token)
     
     os.makedirs(output_dir, exist_ok=True)
     
+    session = create_session()
+    batches = [issue_keys[i:i + SEARCH_BATCH_SIZE] for i in range(0, len(issue_keys), SEARCH_BATCH_SIZE)]
+    
     all_bugs = []
-    for issue_key in issue_keys:
-        api_url = f"{settings.JIRA_DOMAIN}/rest/api/2/issue/{issue_key}"
-        try:
-            bug_data = fetch_bug_data(api_url, auth)
-            all_bugs.append(bug_data)
-            write_bug_to_md(bug_data, output_dir)
-        except Exception as e:
-            print(f"Could not process {issue_key}: {e}")
+    md_files = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(fetch_issues, session, settings.JIRA_DOMAIN, batch, auth): batch
+            for batch in batches
+        }
+        # Markdown is rendered in memory as each batch completes and written in one batch below
+        for future in as_completed(futures):
+            batch = futures[future]
+            try:
+                bugs = future.result()
+            except Exception as e:
+                print(f"Could not process {', '.join(batch)}: {e}")
+                continue
+            for bug_data in bugs:
+                all_bugs.append(bug_data)
+                md_files.append(render_bug_md(bug_data, output_dir))
+            returned_keys = {bug_data.get('key') for bug_data in bugs}
+            for issue_key in batch:
+                if issue_key not in returned_keys:
+                    print(f"Could not process {issue_key}: not returned by Jira")
+    
+    write_md_files(md_files, max_workers=max_workers)
 
     if all_bugs:
         analysis_results = analyze_bugs(all_bugs)
@@ -87,10 +176,11 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Fetch Jira bugs and write markdown files")
     parser.add_argument("--issue-file", required=True, help="Path to a file containing issue keys")
     parser.add_argument("--output-dir", default="bugs_md", help="Directory to write bug markdown files")
+    parser.add_argument("--workers", type=int, default=16, help="Number of concurrent Jira requests")
     args = parser.parse_args()
 
     issue_keys = load_issue_keys(args.issue_file)
     if not issue_keys:
         raise SystemExit("No issue keys found in the provided file.")
 
-    main(issue_keys, args.output_dir)
\ No newline at end of file
+    main(issue_keys, args.output_dir, max_workers=args.workers)
\ No newline at end of file
@@ -0,0 +1,32 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from analysis_cache import AnalysisCache
+
+
+def test_analysis_cache_round_trip(tmp_path):
+    """测试写入后可按相同内容命中"""
+    cache = AnalysisCache(str(tmp_path / "cache.db"), namespace="dep:v1")
+    result = {"summary": "登录失败", "urgent": True}
+
+    assert cache.get("content") is None
+    cache.set("content", result)
+    assert cache.get("content") == result
+
+
+def test_analysis_cache_namespace_isolation(tmp_path):
+    """测试部署或提示词版本变化后不命中旧结果"""
+    db_path = str(tmp_path / "cache.db")
+    AnalysisCache(db_path, namespace="dep:v1").set("content", {"summary": "old"})
+
+    assert AnalysisCache(db_path, namespace="dep:v2").get("content") is None
+    assert AnalysisCache(db_path, namespace="other-dep:v1").get("content") is None
+
+
+def test_analysis_cache_unopenable_path(tmp_path):
+    """测试数据库无法打开时缓存禁用而不抛异常"""
+    cache = AnalysisCache(str(tmp_path / "missing" / "cache.db"), namespace="dep:v1")
+
+    cache.set("content", {"summary": "ignored"})
+    assert cache.get("content") is None
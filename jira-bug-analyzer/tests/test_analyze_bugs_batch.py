@@ -0,0 +1,81 @@
+import sys
+import os
+import asyncio
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from langchain_core.messages import SystemMessage
+
+from analysis_cache import AnalysisCache
+from llm_analyzer import BugAnalyzerLLM, AnalysisBatch, BATCH_SYSTEM_PROMPT
+
+
+def _bug_md(key, description):
+    return f"# {key}: Checkout fails\n\n**Status:** To Do\n\n**Description:**\n{description}\n"
+
+
+ITEMS = [
+    ("MP-1", _bug_md("MP-1", "Payment page throws NullPointerException when the cart is empty.")),
+    ("MP-2", _bug_md("MP-2", "Order history shows duplicated entries after refreshing the page twice.")),
+]
+
+
+class FakeBatchLLM:
+    def __init__(self, bug_ids):
+        self.bug_ids = bug_ids
+        self.calls = 0
+
+    async def ainvoke(self, messages):
+        self.calls += 1
+        return AnalysisBatch(items=[
+            {
+                "bug_id": bug_id,
+                "summary": f"summary of {bug_id}",
+                "urgent": False,
+                "urgency_reason": "",
+                "fix_suggestion": "",
+                "has_content": True,
+            }
+            for bug_id in self.bug_ids
+        ])
+
+
+def _analyzer(tmp_path, returned_ids):
+    analyzer = BugAnalyzerLLM.__new__(BugAnalyzerLLM)
+    analyzer._batch_system_msg = SystemMessage(content=BATCH_SYSTEM_PROMPT)
+    analyzer._cache = AnalysisCache(str(tmp_path / "cache.db"), namespace="test")
+    analyzer._batch_structured = FakeBatchLLM(returned_ids)
+    return analyzer
+
+
+def test_batch_matching_ids_are_cached(tmp_path):
+    """测试 bug_id 一致时返回结果并写入缓存"""
+    analyzer = _analyzer(tmp_path, ["MP-2", "MP-1"])
+
+    results = asyncio.run(analyzer.analyze_bugs_batch(ITEMS))
+
+    assert [r["bug_id"] for r in results] == ["MP-1", "MP-2"]
+    assert results[0]["summary"] == "summary of MP-1"
+    assert analyzer._cache.get(ITEMS[0][1])["summary"] == "summary of MP-1"
+    assert analyzer._cache.get(ITEMS[1][1])["summary"] == "summary of MP-2"
+
+
+def test_batch_missing_id_returns_none(tmp_path):
+    """测试响应中缺失的 Bug 返回 None"""
+    analyzer = _analyzer(tmp_path, ["MP-1"])
+
+    results = asyncio.run(analyzer.analyze_bugs_batch(ITEMS))
+
+    assert results[0]["summary"] == "summary of MP-1"
+    assert results[1] is None
+    assert analyzer._cache.get(ITEMS[1][1]) is None
+
+
+def test_batch_rewritten_ids_are_not_mapped(tmp_path):
+    """测试 bug_id 被改写时不按位置对应、不写缓存"""
+    analyzer = _analyzer(tmp_path, ["mp-1", "MP 2"])
+
+    results = asyncio.run(analyzer.analyze_bugs_batch(ITEMS))
+
+    assert results == [None, None]
+    assert analyzer._cache.get(ITEMS[0][1]) is None
+    assert analyzer._cache.get(ITEMS[1][1]) is None
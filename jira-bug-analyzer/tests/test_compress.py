@@ -0,0 +1,39 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from llm_analyzer import _compress, MAX_CONTENT_CHARS, MAX_STACK_FRAMES
+
+
+def test_compress_collapses_blank_lines():
+    """测试合并多余空行"""
+    content = "Login fails\n\n\n\nSteps"
+    assert _compress(content) == "Login fails\n\nSteps"
+
+
+def test_compress_keeps_html_code_samples():
+    """测试保留 {code:html} 中的 HTML 示例（MP-362）"""
+    content = '{code:html}<a href="#main-content" class="skip-link">Skip to main content</a>{code}'
+    assert _compress(content) == content
+
+
+def test_compress_keeps_generics_and_init_frames():
+    """测试不误删 Java 泛型和 <init> 堆栈帧"""
+    content = "Map<String, Object> failed\n    at com.example.Bar.<init>(Bar.java:12)"
+    assert _compress(content) == content
+
+
+def test_compress_truncates_stack_trace():
+    """测试堆栈只保留前若干帧"""
+    frames = [f"    at com.example.Service.call{i}(Service.java:{i})" for i in range(MAX_STACK_FRAMES + 5)]
+    result = _compress("NullPointerException\n" + "\n".join(frames))
+    assert result.count("at com.example.Service") == MAX_STACK_FRAMES
+    assert "... 5 more frames" in result
+
+
+def test_compress_caps_length():
+    """测试超长内容被截断"""
+    content = "word " * 2000
+    result = _compress(content)
+    assert len(result) == MAX_CONTENT_CHARS + 1
+    assert result.endswith("…")
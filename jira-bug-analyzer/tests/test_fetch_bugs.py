@@ -0,0 +1,76 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from main import fetch_bugs_batch, fetch_issues
+
+BASE_URL = 'https://example.atlassian.net'
+
+
+class FakeResponse:
+    def __init__(self, payload, status_code=200):
+        self._payload = payload
+        self.status_code = status_code
+        self.text = str(payload)
+
+    def json(self):
+        return self._payload
+
+
+class FakeSession:
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = []
+
+    def get(self, url, auth=None, params=None):
+        self.calls.append((url, params))
+        return self.responses.pop(0)
+
+
+def test_fetch_bugs_batch_single_search_request():
+    """测试一批 issue key 只发起一次 search 请求"""
+    issues = [{'key': 'MP-1'}, {'key': 'MP-2'}]
+    session = FakeSession(FakeResponse({'issues': issues, 'isLast': True}))
+
+    result = fetch_bugs_batch(session, BASE_URL, ['MP-1', 'MP-2'], ('user', 'token'))
+
+    assert result == issues
+    assert len(session.calls) == 1
+    url, params = session.calls[0]
+    assert url == f'{BASE_URL}/rest/api/2/search/jql'
+    assert params['jql'] == 'key in (MP-1,MP-2)'
+    assert params['maxResults'] == 2
+
+
+def test_fetch_bugs_batch_follows_next_page_token():
+    """测试服务端限制每页数量时继续翻页"""
+    session = FakeSession(
+        FakeResponse({'issues': [{'key': 'MP-1'}], 'nextPageToken': 'abc', 'isLast': False}),
+        FakeResponse({'issues': [{'key': 'MP-2'}], 'isLast': True}),
+    )
+
+    result = fetch_bugs_batch(session, BASE_URL, ['MP-1', 'MP-2'], ('user', 'token'))
+
+    assert result == [{'key': 'MP-1'}, {'key': 'MP-2'}]
+    assert 'nextPageToken' not in session.calls[0][1]
+    assert session.calls[1][1]['nextPageToken'] == 'abc'
+
+
+def test_fetch_bugs_batch_no_issues():
+    """测试返回结果中没有 issues 字段"""
+    session = FakeSession(FakeResponse({}))
+    assert fetch_bugs_batch(session, BASE_URL, ['MP-1'], ('user', 'token')) == []
+
+
+def test_fetch_issues_falls_back_to_single_requests():
+    """测试 search 失败（如存在不存在的 key）时逐个获取"""
+    session = FakeSession(
+        FakeResponse({'errorMessages': ['bad key']}, status_code=400),
+        FakeResponse({'key': 'MP-1'}),
+        FakeResponse({'errorMessages': ['not found']}, status_code=404),
+    )
+
+    result = fetch_issues(session, BASE_URL, ['MP-1', 'MP-404'], ('user', 'token'))
+
+    assert result == [{'key': 'MP-1'}]
+    assert session.calls[1][0] == f'{BASE_URL}/rest/api/2/issue/MP-1'
@@ -0,0 +1,38 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from main import render_bug_md
+
+
+def test_render_bug_md_full_fields():
+    """测试字段完整的bug"""
+    bug = {
+        'key': 'MP-1',
+        'fields': {
+            'summary': 'Login fails',
+            'description': 'Steps to reproduce',
+            'status': {'name': 'Open'},
+            'assignee': {'displayName': 'Alex'},
+        }
+    }
+
+    filepath, content = render_bug_md(bug, 'bugs_md')
+
+    assert filepath == os.path.join('bugs_md', 'MP-1.md')
+    assert content == (
+        "# MP-1: Login fails\n\n**Status:** Open\n\n**Assignee:** Alex\n\n"
+        "**Description:**\nSteps to reproduce\n"
+    )
+
+
+def test_render_bug_md_missing_fields():
+    """测试缺失字段和空值"""
+    bug = {'key': 'MP-2', 'fields': {'summary': 'No desc', 'description': None, 'status': None, 'assignee': None}}
+
+    _, content = render_bug_md(bug, 'bugs_md')
+
+    assert content == (
+        "# MP-2: No desc\n\n**Status:** Unknown\n\n**Assignee:** Unassigned\n\n"
+        "**Description:**\nNone\n"
+    )
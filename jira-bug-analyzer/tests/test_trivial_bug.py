@@ -0,0 +1,31 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from llm_analyzer import _is_trivial
+
+
+def _bug_md(description):
+    return f"# MP-1: LATAM Rollout\n\n**Status:** To Do\n\n**Assignee:** Unassigned\n\n**Description:**\n{description}\n"
+
+
+def test_is_trivial_no_description():
+    """测试只有标题、描述为 None 的文档"""
+    assert _is_trivial(_bug_md(None))
+    assert _is_trivial(_bug_md("No description"))
+
+
+def test_is_trivial_short_description():
+    """测试描述过短的文档"""
+    assert _is_trivial(_bug_md("TBD"))
+
+
+def test_is_trivial_real_description():
+    """测试有实际描述的文档"""
+    assert not _is_trivial(_bug_md("Login page returns HTTP 500 when the password contains unicode characters."))
+
+
+def test_is_trivial_free_form_content():
+    """测试非骨架格式的文档按整体有效字符数判断"""
+    assert _is_trivial("Crash!")
+    assert not _is_trivial("The export job crashes with OutOfMemoryError when more than 10k rows are selected.")